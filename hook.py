@@ -1,12 +1,28 @@
 #!/usr/bin/env python3
 # DoomSat ViZDoom Hook — manual control + linear policy + Tier-0 + F' frames
 
-import argparse, json, math, time, zlib, struct, os, sys, random
+import argparse, array, io, json, math, queue, threading, time, zlib, struct, os, sys, random
 from pathlib import Path
 
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")   # keep headless stdout clean
 import pygame
 from vizdoom import DoomGame, Mode, ScreenResolution, GameVariable, Button
 
+try:
+    import google_crc32c   # SSE4.2 / ARMv8 CRC32C, slicing-by-8 C fallback
+except ImportError:
+    google_crc32c = None
+
+try:
+    import zstandard       # --t0-compress zstd
+except ImportError:
+    zstandard = None
+
+try:
+    import blosc           # --t0-compress blosc
+except ImportError:
+    blosc = None
+
 # ----------------------------- utilities -----------------------------
 
 def make_action_map(g: DoomGame):
@@ -15,8 +31,21 @@ def make_action_map(g: DoomGame):
     idx = {name: i for i, name in enumerate(names)}
     return idx, names
 
-def empty_action(n): return [0] * n
-def clamp(v, lo, hi): return lo if v < lo else hi if v > hi else v
+def dumps_compact(obj, sort_keys: bool = False) -> bytes:
+    """Compact ASCII JSON bytes in the canonical form the CRC readers re-serialize to.
+
+    Stays on json with its default ensure_ascii: floats come out as repr()
+    (1e-07, 1.52587890625e-05), same as the Tier-0 template, and non-ASCII
+    text as \\u escapes, same as the baseline CRC body.
+    """
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys).encode()
+
+def crc32c(data: bytes, crc: int = 0) -> int:
+    """CRC32C (Castagnoli) of data, continuing from crc. zlib CRC-32 if google-crc32c is missing."""
+    if google_crc32c is not None:
+        return google_crc32c.extend(crc, data)
+    return zlib.crc32(data, crc) & 0xffffffff
+
 
 def ensure_movement_buttons(g: DoomGame, enable: bool):
     """
@@ -33,50 +62,288 @@ def ensure_movement_buttons(g: DoomGame, enable: bool):
     ]
     g.set_available_buttons(wanted)
 
-# weapon slot -> nominal damage (proxy for telemetry)
-NOMINAL_DMG = {
-    2: 10,   # pistol
-    3: 35,   # shotgun
-    4: 12,   # chaingun (per shot)
-    5: 100,  # rocket (simplified)
-    6: 20,   # plasma
-    7: 250   # bfg (very simplified)
-}
+# weapon slot -> nominal damage (proxy for telemetry); indexed by slot, 0/1 unused
+NOMINAL_DMG_TABLE = [
+    0, 0,
+    10,   # 2 pistol
+    35,   # 3 shotgun
+    12,   # 4 chaingun (per shot)
+    100,  # 5 rocket (simplified)
+    20,   # 6 plasma
+    250,  # 7 bfg (very simplified)
+]
 
 SLOT2NAME = {2:"PISTOL",3:"SHOTGUN",4:"CHAINGUN",5:"ROCKET",6:"PLASMA",7:"BFG"}
+AMMO_SLOTS = range(2, 8)
+
+def ammo_used_dict(ammo_counts) -> dict:
+    """Named ammo_used form of a slot-indexed ammo_counts list."""
+    return {SLOT2NAME[i]: ammo_counts[i] for i in AMMO_SLOTS}
+
+# Game variables sampled once per tick by read_game_vars(); GV_IDX gives each
+# one's slot in the snapshot. Variables this ViZDoom build lacks are resolved
+# here, once, and read back as their default instead.
+GV_NAMES = ("HEALTH", "ARMOR", "KILLCOUNT", "POSITION_X", "POSITION_Y", "ANGLE", "SELECTED_WEAPON")
+GV_DEFAULTS = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 2.0)
+GV_IDX = {name: i for i, name in enumerate(GV_NAMES)}
+_GV_VARS = tuple(getattr(GameVariable, name, None) for name in GV_NAMES)
+_HAS_POS = _GV_VARS[GV_IDX["POSITION_X"]] is not None and _GV_VARS[GV_IDX["POSITION_Y"]] is not None
+
+def read_game_vars(g: DoomGame) -> list:
+    """One snapshot of GV_NAMES for the current tick."""
+    return [g.get_game_variable(v) if v is not None else d for v, d in zip(_GV_VARS, GV_DEFAULTS)]
 
 # ----------------------------- telemetry -----------------------------
 
+# The F' file and compressed JSONL sit behind a 1 MiB userspace buffer and are
+# not flushed per record or per batch: data reaches the kernel when the buffer
+# fills and on close. Plain JSONL skips that buffer and goes out as one
+# os.writev() per ring batch. With --t0-fsync-every N the sinks are also
+# flushed and fdatasync'd every N records/frames, which bounds what a crash or
+# power loss can eat (e.g. --t0-every 1 at 120 ticks/s with N=300 loses at
+# most ~2.5 s).
+T0_BUF_SIZE = 1 << 20
+T0_FLUSH_EVERY = 32        # JSONL records per ring flush (one write/writev call)
+T0_RING_SIZE = 4096        # max encoded JSONL records held in memory
+FPRIME_BATCH = 1024        # F' frames packed in memory before a single write() (14 KiB)
+
+_FPRIME_STRUCT = struct.Struct(">4sIHHH")   # magic, unix_time, health, armor, kills
+_FPRIME_MAGIC = b"DSF0"
+
+def open_sink(path: str | None):
+    if not path: return None
+    return open(path, "ab", buffering=T0_BUF_SIZE)
+
+def sync_sink(f):
+    f.flush()
+    (os.fdatasync if hasattr(os, "fdatasync") else os.fsync)(f.fileno())
+
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = -1
+if _IOV_MAX <= 0: _IOV_MAX = 1024
+
+def writev_all(fd: int, bufs: list):
+    """os.writev() every buffer in bufs, IOV_MAX at a time, resuming after short writes."""
+    i = 0
+    while i < len(bufs):
+        n = os.writev(fd, bufs[i:i + _IOV_MAX])
+        while i < len(bufs) and n >= len(bufs[i]):
+            n -= len(bufs[i]); i += 1
+        if n:
+            bufs[i] = memoryview(bufs[i])[n:]
+
+T0_COMPRESS = ("none", "zstd", "blosc")
+T0_JSONL_DEFAULT = {"none": "t0.jsonl", "zstd": "t0.jsonl.zst", "blosc": "t0.jsonl.blosc"}
+_BLOSC_LEN = struct.Struct(">I")
+
+class BloscFrameWriter:
+    """
+    Compresses each write() into one length-prefixed Blosc frame: a big-endian
+    uint32 byte count followed by the blosc.compress() blob. T0 writes one
+    ring batch per call, so a frame holds T0_FLUSH_EVERY records.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+
+    def write(self, data: bytes):
+        blob = blosc.compress(data, typesize=1)
+        self.raw.write(_BLOSC_LEN.pack(len(blob)))
+        self.raw.write(blob)
+
+    def flush(self): self.raw.flush()
+    def close(self): self.raw.close()
+
+def open_jsonl_sink(path: str | None, compress: str):
+    """(writer, underlying file) for the Tier-0 JSONL output."""
+    if path and compress == "none" and hasattr(os, "writev"):
+        raw = open(path, "ab", buffering=0)   # batches go straight to writev()
+        return raw, raw
+    raw = open_sink(path)
+    if raw is None or compress == "none":
+        return raw, raw
+    if compress == "zstd":
+        # plain zstd frame stream: `zstd -dc t0.jsonl.zst` gives back the JSONL
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw), raw
+    if compress == "blosc":
+        return BloscFrameWriter(raw), raw
+    raise ValueError(f"unknown Tier-0 compression: {compress!r}")
+
 class T0:
-    def __init__(self, jsonl_path: str | None, fprime_path: str | None):
-        self.jsonl = open(jsonl_path, "ab") if jsonl_path else None
-        self.fbin = open(fprime_path, "ab") if fprime_path else None
+    def __init__(self, jsonl_path: str | None, fprime_path: str | None,
+                 base_meta: dict | None = None, legacy_json: bool = False,
+                 ring_size: int = T0_RING_SIZE, fsync_every: int = 0,
+                 compress: str = "none"):
+        self.jsonl, self._jsonl_file = open_jsonl_sink(jsonl_path, compress)
+        self._writev = isinstance(self.jsonl, io.FileIO)
+        self.fbin = open_sink(fprime_path)
+        self.fsync_every = max(0, fsync_every)
+        self._jsonl_unsynced = 0
+        self._fprime_unsynced = 0
+        # JSONL records are encoded, CRC'd and written by a background thread so
+        # disk stalls never reach the tick loop. At most ring_size raw records
+        # wait in the queue; when full, new ones are dropped (and counted)
+        # rather than evicting queued ones. Encoded records collect in _ring,
+        # as the buffers that make up each line, until the next bulk write.
+        self._ring_size = max(1, ring_size)
+        self._ring = []
+        self._ring_records = 0
+        self._flush_at = min(T0_FLUSH_EVERY, self._ring_size)
+        self.dropped_records = 0
+        self._q = queue.SimpleQueue()
+        self._thr = None
+        self._err = None
+        self._fbuf = bytearray(_FPRIME_STRUCT.size * FPRIME_BATCH)
+        self._fmv = memoryview(self._fbuf)
+        self._fpend_n = 0
+        self.base_meta = dict(base_meta or {})
         self.prev_health = None
         self.prev_dmg_out = 0
         self.prev_kills = 0
+        # base_meta and the constant keys are merged once, not per record
+        self._base_rec = self._base_record()
+        # Pre-serialized record: every constant key is encoded once here, per step
+        # we only format the variable fields into it (see _build_template).
+        self._tmpl = None if legacy_json else self._build_template()
+        if self.jsonl:
+            self._thr = threading.Thread(target=self._writer_loop, name="t0-writer", daemon=True)
+            self._thr.start()
 
     def close(self):
-        if self.jsonl: self.jsonl.close()
-        if self.fbin: self.fbin.close()
+        try:
+            if self.fbin:
+                self._write_fprime()
+                self.fbin.close()
+        finally:
+            if self.jsonl:   # drained and closed even if the F' flush failed
+                self._q.put(None)
+                self._thr.join()
+                try:
+                    self.jsonl.close()
+                finally:
+                    self._jsonl_file.close()   # no-op unless the writer left it open
+        if self.dropped_records:
+            print(f"[t0] dropped {self.dropped_records} records (ring full)", file=sys.stderr)
+        if self._err is not None:
+            raise self._err   # writer failed after the last write_jsonl (e.g. final flush)
+
+    def _writer_loop(self):
+        q = self._q
+        try:
+            while True:
+                item = q.get()
+                if item is None: break
+                self._encode(*item)
+        except BaseException as e:
+            self._err = e   # re-raised on the game thread by the next write_jsonl or close()
+            while q.get() is not None: pass
+        finally:
+            if self._err is None:
+                try: self.flush_ring()
+                except BaseException as e: self._err = e
+
+    def _write_fprime(self):
+        if self._fpend_n:
+            self.fbin.write(self._fmv[:self._fpend_n * _FPRIME_STRUCT.size])
+            self._fpend_n = 0
+
+    def flush_ring(self):
+        if self._ring:
+            if self._writev:
+                writev_all(self.jsonl.fileno(), self._ring)
+            else:
+                self.jsonl.write(b"".join(self._ring))
+            self._ring.clear()
+            self._ring_records = 0
+
+    def _push(self, *parts: bytes):
+        self._ring.extend(parts)
+        self._ring_records += 1
+        if self._ring_records >= self._flush_at:
+            self.flush_ring()
+        if self.fsync_every:
+            self._jsonl_unsynced += 1
+            if self._jsonl_unsynced >= self.fsync_every:
+                self.flush_ring()
+                self.jsonl.flush()   # compressors: push out the pending block first
+                sync_sink(self._jsonl_file)
+                self._jsonl_unsynced = 0
+
+    def _base_record(self) -> dict:
+        # Every key in its final position; the per-step ones are placeholders
+        # that _record overwrites (assignment keeps dict order).
+        base_meta = self.base_meta
+        return {
+            "type": "tier0_telemetry",
+            "schema": "v1",
+            "unix_time": 0,
+            "unix_time_ms": 0,
+            "step": 0,
+            **base_meta,
+            "level": base_meta.get("level_start", "E1M1"),
+            "health": 0,
+            "armor": 0,
+            "selected_weapon": 0,
+            "pose": None,
+            "keys": {"red": 0, "blue": 0, "yellow": 0},
+            "secrets_found": 0,
+            "resources": None,
+            "combat": None,
+            "performance": {"avg_fps": 0, "avg_frame_ms": 0, "cpu_pct": 0, "rss_mb": 0, "gc_events": 0},
+            "faults": {"ecc_corrected": 0, "bitflips_injected": 0, "watchdog_resets": 0},
+            "outcome": "ALIVE",
+        }
 
-    def write_jsonl(self, base_meta: dict, g: DoomGame, dmg_out_total: int, ammo_used: dict, step: int):
+    def _record(self, unix_time, unix_time_ms, step, h, a, sel, px, py, pyaw,
+                dmg_in_delta, dmg_out_delta, kills_delta, ammo_used) -> dict:
+        rec = self._base_rec.copy()
+        rec["unix_time"] = unix_time
+        rec["unix_time_ms"] = unix_time_ms
+        rec["step"] = step
+        rec["health"] = h
+        rec["armor"] = a
+        rec["selected_weapon"] = sel
+        rec["pose"] = {"x": px, "y": py, "yaw_deg": pyaw}
+        rec["resources"] = {"ammo_used": ammo_used, "medkits_used": 0, "armor_picked": 0}
+        rec["combat"] = {"dmg_in_delta": dmg_in_delta, "dmg_out_delta": dmg_out_delta, "kills_delta": kills_delta}
+        return rec
+
+    def _build_template(self) -> str:
+        """
+        Encode the record once with a marker in every variable slot and turn it
+        into a str.format template. Keys stay sorted and compact, so the rendered
+        line is byte-identical to the body the CRC has always been computed over.
+        The closing brace is left off so crc32c can be appended without re-encoding.
+        """
+        marks = [f"@t0:{i}@" for i in range(12 + len(AMMO_SLOTS))]
+        ammo_marks = dict(zip((SLOT2NAME[i] for i in AMMO_SLOTS), marks[12:]))
+        body = dumps_compact(self._record(*marks[:12], ammo_marks), sort_keys=True).decode()
+        body = body.replace("{", "{{").replace("}", "}}")
+        for i, m in enumerate(marks):
+            # pose floats (6..8) are rendered with repr(), the shortest round-trip form
+            body = body.replace(f'"{m}"', f"{{{i}!r}}" if 6 <= i <= 8 else f"{{{i}}}")
+        return body[:-2]
+
+    def write_jsonl(self, now_ns: int, gv: list, dmg_out_total: int, ammo_counts: list, step: int):
+        """Queue one Tier-0 record; encoding happens on the writer thread."""
+        if not self.jsonl: return
+        if self._err is not None: raise self._err
+        if self._q.qsize() >= self._ring_size:
+            self.dropped_records += 1
+            return
+        # gv is a fresh list per tick; ammo_counts keeps mutating, so copy it
+        self._q.put((now_ns, gv, dmg_out_total, ammo_counts[:], step))
+
+    def _encode(self, now_ns: int, gv: list, dmg_out_total: int, ammo_counts: list, step: int):
         # High-resolution time plus the old unix_time (seconds)
-        now = time.time()
-        unix_time = int(now)
-        unix_time_ms = int(now * 1000)
-
-        # Basic state
-        h  = int(g.get_game_variable(GameVariable.HEALTH))
-        a  = int(g.get_game_variable(GameVariable.ARMOR)) if hasattr(GameVariable, "ARMOR") else 0
-        kills = int(g.get_game_variable(GameVariable.KILLCOUNT)) if hasattr(GameVariable, "KILLCOUNT") else 0
+        unix_time = now_ns // 1_000_000_000
+        unix_time_ms = now_ns // 1_000_000
 
-        # Pose & orientation (if scenario exposes them)
-        px = float(g.get_game_variable(GameVariable.POSITION_X)) if hasattr(GameVariable, "POSITION_X") else 0.0
-        py = float(g.get_game_variable(GameVariable.POSITION_Y)) if hasattr(GameVariable, "POSITION_Y") else 0.0
-        pyaw = float(g.get_game_variable(GameVariable.ANGLE)) if hasattr(GameVariable, "ANGLE") else 0.0
-
-        # Selected weapon (slot)
-        sel = int(g.get_game_variable(GameVariable.SELECTED_WEAPON)) if hasattr(GameVariable, "SELECTED_WEAPON") else 2
+        # Basic state, pose & orientation, selected weapon (slot) -- in GV_NAMES order
+        h, a, kills, px, py, pyaw, sel = gv
+        h, a, kills, sel = int(h), int(a), int(kills), int(sel)
+        px, py, pyaw = float(px), float(py), float(pyaw)
 
         # Deltas
         if self.prev_health is None:
@@ -90,44 +357,40 @@ class T0:
         self.prev_dmg_out = dmg_out_total
         self.prev_kills = kills
 
-        rec = {
-            "type": "tier0_telemetry",
-            "schema": "v1",
-            "unix_time": unix_time,
-            "unix_time_ms": unix_time_ms,
-            "step": step,
-            **base_meta,
-            "level": base_meta.get("level_start", "E1M1"),
-            "health": h,
-            "armor": a,
-            "selected_weapon": sel,
-            "pose": {"x": px, "y": py, "yaw_deg": pyaw},
-            "keys": {"red": 0, "blue": 0, "yellow": 0},
-            "secrets_found": 0,
-            "resources": {"ammo_used": ammo_used, "medkits_used": 0, "armor_picked": 0},
-            "combat": {"dmg_in_delta": dmg_in_delta, "dmg_out_delta": dmg_out_delta, "kills_delta": kills_delta},
-            "performance": {"avg_fps": 0, "avg_frame_ms": 0, "cpu_pct": 0, "rss_mb": 0, "gc_events": 0},
-            "faults": {"ecc_corrected": 0, "bitflips_injected": 0, "watchdog_resets": 0},
-            "outcome": "ALIVE",
-        }
+        if self._tmpl is None:
+            rec = self._record(unix_time, unix_time_ms, step, h, a, sel, px, py, pyaw,
+                               dmg_in_delta, dmg_out_delta, kills_delta, ammo_used_dict(ammo_counts))
 
-        # CRC over the record WITHOUT crc32c itself
-        body = json.dumps(rec, separators=(",", ":"), sort_keys=True).encode()
-        rec["crc32c"] = f"{zlib.crc32(body) & 0xffffffff:08x}"
+            # CRC over the record WITHOUT crc32c itself; the line is that body
+            # with crc32c appended, byte-identical to the template path
+            body = dumps_compact(rec, sort_keys=True)
+            self._push(body[:-1], b',"crc32c":"%08x"}\n' % crc32c(body))
+            return
 
-        if self.jsonl:
-            self.jsonl.write((json.dumps(rec) + "\n").encode())
-            self.jsonl.flush()
+        head = self._tmpl.format(unix_time, unix_time_ms, step, h, a, sel, px, py, pyaw,
+                                 dmg_in_delta, dmg_out_delta, kills_delta, *ammo_counts[2:8]).encode()
+        # CRC over head + "}" (the record WITHOUT crc32c itself), fed incrementally
+        crc = crc32c(b"}", crc32c(head))
+        self._push(head, b',"crc32c":"%08x"}\n' % crc)
 
-    def write_fprime(self, g: DoomGame):
+    def write_fprime(self, now_ns: int, gv: list):
         if not self.fbin: return
-        magic = b"DSF0"
-        now = int(time.time())
-        h  = int(g.get_game_variable(GameVariable.HEALTH))
-        a  = int(g.get_game_variable(GameVariable.ARMOR)) if hasattr(GameVariable, "ARMOR") else 0
-        kills = int(g.get_game_variable(GameVariable.KILLCOUNT)) if hasattr(GameVariable, "KILLCOUNT") else 0
-        pkt = struct.pack(">4sIHHH", magic, now, clamp(h,0,65535), clamp(a,0,65535), clamp(kills,0,65535))
-        self.fbin.write(pkt); self.fbin.flush()
+        now = now_ns // 1_000_000_000
+        h  = int(gv[GV_IDX["HEALTH"]])
+        a  = int(gv[GV_IDX["ARMOR"]])
+        kills = int(gv[GV_IDX["KILLCOUNT"]])
+        # health goes negative on death; keep that at 0 rather than wrapping to 65xxx
+        _FPRIME_STRUCT.pack_into(self._fbuf, self._fpend_n * _FPRIME_STRUCT.size, _FPRIME_MAGIC,
+                                 now, (h if h > 0 else 0) & 0xffff, a & 0xffff, kills & 0xffff)
+        self._fpend_n += 1
+        if self._fpend_n >= FPRIME_BATCH:
+            self._write_fprime()
+        if self.fsync_every:
+            self._fprime_unsynced += 1
+            if self._fprime_unsynced >= self.fsync_every:
+                self._write_fprime()
+                sync_sink(self.fbin)
+                self._fprime_unsynced = 0
 
 # ----------------------------- helpers -----------------------------
 
@@ -142,29 +405,38 @@ def apply_debug_aids(g: DoomGame, give_all: bool, inf_ammo: bool, hp_floor: int|
     except Exception:
         pass
 
-def force_weapon(g: DoomGame, name: str):
-    name = name.lower()
-    slot = {"pistol":"2","shotgun":"3","chaingun":"4","rocketlauncher":"5","plasma":"6","bfg":"7"}.get(name)
-    if slot:
-        try: g.send_game_command(f"slot {slot}")
-        except Exception: pass
+_WEAPON2SLOT = {"pistol":"2","shotgun":"3","chaingun":"4","rocketlauncher":"5","plasma":"6","bfg":"7"}
+_SLOT_CMD = {s: f"slot {s}" for s in _WEAPON2SLOT.values()}
+_KEY2SLOT = {pygame.K_2:"2", pygame.K_3:"3", pygame.K_4:"4", pygame.K_5:"5", pygame.K_6:"6", pygame.K_7:"7"}
+
+def select_slot(g: DoomGame, slot: str):
+    try: g.send_game_command(_SLOT_CMD[slot])
+    except Exception: pass
 
-def selected_weapon_slot(g: DoomGame) -> int:
-    if hasattr(GameVariable,"SELECTED_WEAPON"):
-        return int(g.get_game_variable(GameVariable.SELECTED_WEAPON))
-    return 2
+def force_weapon(g: DoomGame, name: str):
+    slot = _WEAPON2SLOT.get(name.lower())
+    if slot: select_slot(g, slot)
 
 # ----------------------------- manual play -----------------------------
 
+MANUAL_TPS = 120   # manual-mode loop iterations per second
+
 def play_manual(cfg:str, steps:int, slow_ms:int, hold_after:int,
                 give_all:bool, inf_ammo:bool, hp_floor:int|None, turbo:int|None,
                 t0_every:int, t0_jsonl:str|None, fprime_frames:str|None,
                 force_movement:bool, tick_repeat:int,
-                episode_tics:int|None=None, auto_restart:bool=False):
+                episode_tics:int|None=None, auto_restart:bool=False,
+                legacy_json:bool=False, t0_ring_size:int=T0_RING_SIZE,
+                t0_fsync_every:int=0, helper_window:bool=True, t0_compress:str="none"):
+    """
+    helper_window=True drives the game from a small pygame window (WASD etc.).
+    helper_window=False skips pygame entirely: ViZDoom runs in SPECTATOR mode
+    and reads the keyboard in its own window; we just advance and record.
+    """
     g = DoomGame()
     g.load_config(cfg)
     g.set_screen_resolution(ScreenResolution.RES_640X480)
-    g.set_mode(Mode.PLAYER)
+    g.set_mode(Mode.PLAYER if helper_window else Mode.SPECTATOR)
     g.set_window_visible(True)
     g.set_render_hud(True); g.set_render_weapon(True)
     g.set_render_crosshair(True); g.set_render_decals(True); g.set_render_particles(True)
@@ -181,27 +453,53 @@ def play_manual(cfg:str, steps:int, slow_ms:int, hold_after:int,
     amap, names = make_action_map(g)
     print("[buttons]", names)
 
-    pygame.init()
-    pygame.display.set_caption("DoomSat Controls — focus this window to drive ViZDoom")
-    screen = pygame.display.set_mode((640, 80))  # helper window to capture focus
+    if helper_window:
+        pygame.init()
+        pygame.display.set_caption("DoomSat Controls — focus this window to drive ViZDoom")
+        screen = pygame.display.set_mode((640, 80))  # helper window to capture focus
 
     # debug aids
     apply_debug_aids(g, give_all, inf_ammo, hp_floor, turbo)
 
     # Tier-0 / F' sinks
-    t0 = T0(t0_jsonl, fprime_frames)
     meta = {"run_id":"42","episode_id":"manual","algo_id":"manual","git":"a1b2c3d","rng_seed":123456,"level_start":"E1M1"}
-    ammo_used = {k:0 for k in ["PISTOL","SHOTGUN","CHAINGUN","ROCKET","PLASMA","BFG"]}
+    t0 = T0(t0_jsonl, fprime_frames, meta, legacy_json, t0_ring_size, t0_fsync_every, t0_compress)
+    ammo_counts = [0] * 8   # indexed by weapon slot
+    dmg_by_slot = array.array("i", NOMINAL_DMG_TABLE)
     dmg_out_total = 0
 
+    # button index -> keys that press it (mouse button 0 also fires ATTACK)
+    keymap = [(amap[b], codes) for b, codes in (
+        ("MOVE_FORWARD",  (pygame.K_w, pygame.K_UP)),
+        ("MOVE_BACKWARD", (pygame.K_s, pygame.K_DOWN)),
+        ("MOVE_LEFT",     (pygame.K_a,)),
+        ("MOVE_RIGHT",    (pygame.K_d,)),
+        ("TURN_LEFT",     (pygame.K_LEFT,)),
+        ("TURN_RIGHT",    (pygame.K_RIGHT,)),
+        ("ATTACK",        (pygame.K_SPACE,)),
+    ) if b in amap]
+    attack_idx = amap.get("ATTACK")
+    action = [0] * len(names)   # reused every tick
+
+    tics = max(1, tick_repeat)
+    i_hp, i_sel = GV_IDX["HEALTH"], GV_IDX["SELECTED_WEAPON"]
+    v_hp, v_sel = _GV_VARS[i_hp], _GV_VARS[i_sel]
+    get_var = g.get_game_variable
+
+    # Loop pace (previously pygame's Clock.tick(120)): sleep until the next
+    # deadline on the monotonic clock; if we fall behind, don't try to catch up.
+    tick_s = 1.0 / MANUAL_TPS
+    next_t = time.monotonic()
+
     step = 0
-    clock = pygame.time.Clock()
+    finished = g.is_episode_finished()   # then queried once per tick, after make_action
 
     try:
         while True:
-            if g.is_episode_finished():
+            if finished:
                 if auto_restart:
                     g.new_episode()
+                    finished = False
                 else:
                     break
 
@@ -209,48 +507,60 @@ def play_manual(cfg:str, steps:int, slow_ms:int, hold_after:int,
                 break
             step += 1
 
-            action = empty_action(len(names))
-            keys = pygame.key.get_pressed()
-            mouse_buttons = pygame.mouse.get_pressed()
-
-            if "MOVE_FORWARD" in amap and (keys[pygame.K_w] or keys[pygame.K_UP]):  action[amap["MOVE_FORWARD"]] = 1
-            if "MOVE_BACKWARD" in amap and (keys[pygame.K_s] or keys[pygame.K_DOWN]): action[amap["MOVE_BACKWARD"]] = 1
-            if "MOVE_LEFT" in amap and keys[pygame.K_a]:   action[amap["MOVE_LEFT"]]  = 1
-            if "MOVE_RIGHT" in amap and keys[pygame.K_d]:  action[amap["MOVE_RIGHT"]] = 1
-            if "TURN_LEFT" in amap and keys[pygame.K_LEFT]:  action[amap["TURN_LEFT"]]  = 1
-            if "TURN_RIGHT" in amap and keys[pygame.K_RIGHT]: action[amap["TURN_RIGHT"]] = 1
-            if "ATTACK" in amap and (keys[pygame.K_SPACE] or mouse_buttons[0]): action[amap["ATTACK"]] = 1
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    raise KeyboardInterrupt
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE: raise KeyboardInterrupt
-                    if event.key == pygame.K_2: force_weapon(g,"pistol")
-                    if event.key == pygame.K_3: force_weapon(g,"shotgun")
-                    if event.key == pygame.K_4: force_weapon(g,"chaingun")
-                    if event.key == pygame.K_5: force_weapon(g,"rocketlauncher")
-                    if event.key == pygame.K_6: force_weapon(g,"plasma")
-                    if event.key == pygame.K_7: force_weapon(g,"bfg")
-
-            g.make_action(action, max(1, tick_repeat))
-
-            if hp_floor and int(g.get_game_variable(GameVariable.HEALTH)) < hp_floor:
+            if helper_window:
+                # every mapped button is rewritten each tick, unmapped ones stay 0
+                keys = pygame.key.get_pressed()
+                for idx, codes in keymap:
+                    action[idx] = 1 if any(map(keys.__getitem__, codes)) else 0
+                if attack_idx is not None and pygame.mouse.get_pressed()[0]:
+                    action[attack_idx] = 1
+
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        raise KeyboardInterrupt
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE: raise KeyboardInterrupt
+                        key_slot = _KEY2SLOT.get(event.key)
+                        if key_slot: select_slot(g, key_slot)
+
+                g.make_action(action, tics)
+            else:
+                # the player's input comes from ViZDoom's own window
+                g.advance_action(tics)
+                action = g.get_last_action()
+            finished = g.is_episode_finished()
+
+            # Full snapshot only when a record is due; other ticks read just
+            # what they use (HEALTH for hp_floor, SELECTED_WEAPON on attack).
+            attacking = attack_idx is not None and action[attack_idx]
+            emit = t0_every and step % t0_every == 0
+            if emit:
+                gv = read_game_vars(g)
+                sel, hp = gv[i_sel], gv[i_hp]
+            else:
+                if attacking: sel = get_var(v_sel) if v_sel is not None else GV_DEFAULTS[i_sel]
+                if hp_floor and not finished: hp = get_var(v_hp)
+
+            if hp_floor and not finished and int(hp) < hp_floor:
                 apply_debug_aids(g, give_all=False, inf_ammo=False, hp_floor=hp_floor, turbo=None)
 
-            if "ATTACK" in amap and action[amap["ATTACK"]]:
-                slot = selected_weapon_slot(g)
-                name = SLOT2NAME.get(slot, "PISTOL")
-                ammo_used[name] = ammo_used.get(name,0) + 1
-                dmg_out_total += NOMINAL_DMG.get(slot, 10)
+            if attacking:
+                slot = int(sel)
+                if not 2 <= slot <= 7: slot = 2   # fist/chainsaw are booked as pistol
+                ammo_counts[slot] += 1
+                dmg_out_total += dmg_by_slot[slot]
 
-            if t0_every and step % t0_every == 0:
-                t0.write_jsonl(meta, g, dmg_out_total, ammo_used, step)
-                t0.write_fprime(g)
+            if emit:
+                now_ns = time.time_ns()   # one clock read shared by both sinks
+                t0.write_jsonl(now_ns, gv, dmg_out_total, ammo_counts, step)
+                t0.write_fprime(now_ns, gv)
 
             if slow_ms > 0:
                 time.sleep(slow_ms/1000.0)
-            clock.tick(120)
+            next_t += tick_s
+            delay = next_t - time.monotonic()
+            if delay > 0: time.sleep(delay)
+            else: next_t = time.monotonic()
 
     except KeyboardInterrupt:
         pass
@@ -261,9 +571,11 @@ def play_manual(cfg:str, steps:int, slow_ms:int, hold_after:int,
                 time.sleep(hold_after)
             except KeyboardInterrupt:
                 pass
-        t0.close()
-        pygame.quit()
-        g.close()
+        try:
+            t0.close()
+        finally:
+            if helper_window: pygame.quit()
+            g.close()
 
     print(json.dumps({"type":"manual_session_done","steps":step}, indent=2))
 
@@ -273,7 +585,9 @@ def run_episode(cfg:str, steps:int, slow_ms:int, hold:int,
                 weapon:str|None, sweep_period:float, repeat:int,
                 give_all:bool, inf_ammo:bool, hp_floor:int|None, turbo:int|None,
                 t0_every:int, t0_jsonl:str|None, fprime_frames:str|None,
-                force_movement:bool, episode_tics:int|None):
+                force_movement:bool, episode_tics:int|None, legacy_json:bool=False,
+                t0_ring_size:int=T0_RING_SIZE, t0_fsync_every:int=0,
+                t0_compress:str="none"):
     g = DoomGame()
     g.load_config(cfg)
     g.set_screen_resolution(ScreenResolution.RES_640X480)
@@ -294,63 +608,101 @@ def run_episode(cfg:str, steps:int, slow_ms:int, hold:int,
     apply_debug_aids(g, give_all, inf_ammo, hp_floor, turbo)
     if weapon: force_weapon(g, weapon)
 
-    t0 = T0(t0_jsonl, fprime_frames)
     meta = {"run_id":"42","episode_id":"7","algo_id":"linear-policy","git":"a1b2c3d","rng_seed":123456,"level_start":"E1M1"}
-    ammo_used = {k:0 for k in ["PISTOL","SHOTGUN","CHAINGUN","ROCKET","PLASMA","BFG"]}
+    t0 = T0(t0_jsonl, fprime_frames, meta, legacy_json, t0_ring_size, t0_fsync_every, t0_compress)
+    ammo_counts = [0] * 8   # indexed by weapon slot
+    dmg_by_slot = array.array("i", NOMINAL_DMG_TABLE)
     dmg_out_total = 0
 
+    # Turn sweep: sin(step/period * tau) < 0 on the second half of each period,
+    # i.e. when the phase left until the next period start is < period/2. Same
+    # sign test without trig per tick. Where sin's sign was rounding noise, ticks
+    # exactly on a whole period now turn left and ticks exactly on an odd half
+    # period turn right (step 3 of period 6).
+    period = max(1.0, sweep_period)
+    half = period / 2.0
+
+    # One action list for the whole run: forward + attack are held throughout,
+    # only the two turn buttons are rewritten each tick.
+    action = [0] * len(names)
+    if "MOVE_FORWARD" in amap: action[amap["MOVE_FORWARD"]] = 1
+    attack_idx = amap.get("ATTACK")
+    if attack_idx is not None: action[attack_idx] = 1
+    if "TURN_LEFT" in amap and "TURN_RIGHT" in amap:
+        turn_left, turn_right = amap["TURN_LEFT"], amap["TURN_RIGHT"]
+    else:
+        turn_left = turn_right = None
+
+    # Loop invariants bound to locals: the tick body below is the hottest
+    # Python in the module on headless runs with --slow-ms 0.
+    tics = max(1, repeat)
+    has_pos = _HAS_POS
+    i_x, i_y = GV_IDX["POSITION_X"], GV_IDX["POSITION_Y"]
+    i_hp, i_sel = GV_IDX["HEALTH"], GV_IDX["SELECTED_WEAPON"]
+    v_x, v_y, v_hp, v_sel = _GV_VARS[i_x], _GV_VARS[i_y], _GV_VARS[i_hp], _GV_VARS[i_sel]
+    get_var = g.get_game_variable
+    hypot = math.hypot
+
     g.new_episode()
     step = 0
     path_len = 0.0
-    last_pos = None
+    last_x = last_y = None
 
     try:
         while not g.is_episode_finished():
             if steps and step >= steps: break
             step += 1
 
-            action = empty_action(len(names))
-            if "TURN_LEFT" in amap and "TURN_RIGHT" in amap:
-                phase = math.sin((step / max(1.0, sweep_period)) * math.tau)
-                if phase < 0: action[amap["TURN_LEFT"]] = 1
-                else:         action[amap["TURN_RIGHT"]] = 1
-            if "MOVE_FORWARD" in amap: action[amap["MOVE_FORWARD"]] = 1
-            if "ATTACK" in amap: action[amap["ATTACK"]] = 1
-
-            g.make_action(action, max(1, repeat))
-
-            if hasattr(GameVariable, "POSITION_X"):
-                x = g.get_game_variable(GameVariable.POSITION_X)
-                y = g.get_game_variable(GameVariable.POSITION_Y)
-                if last_pos is not None:
-                    dx = x - last_pos[0]; dy = y - last_pos[1]
-                    path_len += math.hypot(dx, dy)
-                last_pos = (x, y)
-
-            if "ATTACK" in amap and action[amap["ATTACK"]]:
-                slot = selected_weapon_slot(g)
-                name = SLOT2NAME.get(slot, "PISTOL")
-                ammo_used[name] = ammo_used.get(name,0) + 1
-                dmg_out_total += NOMINAL_DMG.get(slot, 10)
-
-            if hp_floor and int(g.get_game_variable(GameVariable.HEALTH)) < hp_floor:
+            if turn_left is not None:
+                left = -step % period < half
+                action[turn_left] = 1 if left else 0
+                action[turn_right] = 0 if left else 1
+
+            g.make_action(action, tics)
+
+            # Full snapshot only when a record is due; other ticks read just
+            # what the bookkeeping below uses.
+            emit = t0_every and step % t0_every == 0
+            if emit:
+                gv = read_game_vars(g)
+                x, y, sel, hp = gv[i_x], gv[i_y], gv[i_sel], gv[i_hp]
+            else:
+                if has_pos: x = get_var(v_x); y = get_var(v_y)
+                if attack_idx is not None: sel = get_var(v_sel) if v_sel is not None else GV_DEFAULTS[i_sel]
+                if hp_floor: hp = get_var(v_hp)
+
+            if has_pos:
+                if last_x is not None:
+                    path_len += hypot(x - last_x, y - last_y)
+                last_x = x; last_y = y
+
+            if attack_idx is not None:
+                slot = int(sel)
+                if not 2 <= slot <= 7: slot = 2   # fist/chainsaw are booked as pistol
+                ammo_counts[slot] += 1
+                dmg_out_total += dmg_by_slot[slot]
+
+            if hp_floor and int(hp) < hp_floor:
                 apply_debug_aids(g, give_all=False, inf_ammo=False, hp_floor=hp_floor, turbo=None)
 
-            if t0_every and step % t0_every == 0:
-                t0.write_jsonl(meta, g, dmg_out_total, ammo_used, step)
-                t0.write_fprime(g)
+            if emit:
+                now_ns = time.time_ns()   # one clock read shared by both sinks
+                t0.write_jsonl(now_ns, gv, dmg_out_total, ammo_counts, step)
+                t0.write_fprime(now_ns, gv)
 
             if slow_ms > 0: time.sleep(slow_ms/1000.0)
 
     except KeyboardInterrupt:
         pass
     finally:
-        t0.close()
-        if hold > 0:
-            print(f"Holding window for {hold} seconds... (Ctrl+C to quit)")
-            try: time.sleep(hold)
-            except KeyboardInterrupt: pass
-        g.close()
+        try:
+            t0.close()
+        finally:
+            if hold > 0:
+                print(f"Holding window for {hold} seconds... (Ctrl+C to quit)")
+                try: time.sleep(hold)
+                except KeyboardInterrupt: pass
+            g.close()
 
     summary = {
         "type":"episode_summary","schema":"v1","unix_time":int(time.time()),
@@ -358,7 +710,7 @@ def run_episode(cfg:str, steps:int, slow_ms:int, hold:int,
         "level_start":"E1M1","levels_completed":1,"result":"UNKNOWN","duration_s":round(max(0.01, step/300.0),2),
         "deaths":0,
         "damage":{"taken_total":int(random.choice([60,72,84,90,96])),"dealt_total":dmg_out_total,"dealt_by_enemy":{}},
-        "resources":{"ammo_used":ammo_used,"medkits_used":0,"armor_picked":0},
+        "resources":{"ammo_used":ammo_used_dict(ammo_counts),"medkits_used":0,"armor_picked":0},
         "efficiency":{"dmg_per_ammo":{},"strong_targeting_pct":0.0,"overkill_pct":0.0},
         "performance":{"avg_fps":round(1000.0/max(1.0, slow_ms),2) if slow_ms else 300.0,"avg_frame_ms":round(slow_ms or 3.5,2),
                        "cpu_pct":0,"rss_mb":0,"gc_events":0},
@@ -366,8 +718,8 @@ def run_episode(cfg:str, steps:int, slow_ms:int, hold:int,
         "nav":{"path_len_m":round(path_len,2),"backtrack_pct":0.0,"stuck_events":0},
         "kills": 0
     }
-    body = json.dumps(summary, separators=(",", ":"), sort_keys=True).encode()
-    summary["crc32c"] = f"{zlib.crc32(body) & 0xffffffff:08x}"
+    body = dumps_compact(summary, sort_keys=True)
+    summary["crc32c"] = f"{crc32c(body):08x}"
     print(json.dumps(summary, indent=2))
 
 # ----------------------------- CLI -----------------------------
@@ -376,6 +728,8 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--cfg", default="scenarios/basic.cfg")
     ap.add_argument("--manual", action="store_true", help="manual control mode")
+    ap.add_argument("--no-helper-window", action="store_true",
+                    help="manual mode without pygame: play in ViZDoom's own window (spectator mode)")
     ap.add_argument("--steps", type=int, default=0)
     ap.add_argument("--slow-ms", type=int, default=0)
     ap.add_argument("--hold-after-manual", type=int, default=0, help="seconds to keep window after manual session")
@@ -397,8 +751,14 @@ def main():
     # Tier-0 / F' outputs
     ap.add_argument("--t0-every", type=int, default=0, help="emit Tier-0 record every N steps (0=off)")
     ap.add_argument("--t0-sink", choices=["file","none"], default="file")
-    ap.add_argument("--t0-jsonl", default="t0.jsonl")
+    ap.add_argument("--t0-jsonl", default=None, help="Tier-0 JSONL path (default t0.jsonl, .zst/.blosc added when compressed)")
     ap.add_argument("--fprime-frames", default=None)
+    ap.add_argument("--t0-ring-size", type=int, default=T0_RING_SIZE, help="max Tier-0 records buffered in memory; newest are dropped when full")
+    ap.add_argument("--t0-fsync-every", type=int, default=0,
+                    help="fdatasync Tier-0/F' files every N records (0=only flush on exit; bounds data lost on power loss)")
+    ap.add_argument("--t0-compress", choices=T0_COMPRESS, default="none",
+                    help="compress the Tier-0 JSONL file: zstd stream or length-prefixed blosc frames")
+    ap.add_argument("--legacy-json", action="store_true", help="encode each Tier-0 record from a dict (slow path, for validating the template)")
 
     args = ap.parse_args()
 
@@ -410,6 +770,17 @@ def main():
         else:
             episode_tics = int(round(args.episode_seconds * 35.0))
 
+    if args.t0_compress == "zstd" and zstandard is None:
+        ap.error("--t0-compress zstd needs the 'zstandard' package")
+    if args.t0_compress == "blosc" and blosc is None:
+        ap.error("--t0-compress blosc needs the 'blosc' package")
+
+    if google_crc32c is None:
+        print("[t0] google-crc32c not installed; crc32c fields fall back to zlib CRC-32", file=sys.stderr)
+
+    # never append compressed frames to a plain t0.jsonl left by an earlier run
+    if args.t0_jsonl is None:
+        args.t0_jsonl = T0_JSONL_DEFAULT[args.t0_compress]
     t0_jsonl = args.t0_jsonl if (args.t0_every and args.t0_sink=="file") else None
     fprime_frames = args.fprime_frames
 
@@ -419,7 +790,9 @@ def main():
             give_all=args.give_all, inf_ammo=args.inf_ammo, hp_floor=(args.hp_floor or None), turbo=args.turbo,
             t0_every=args.t0_every, t0_jsonl=t0_jsonl, fprime_frames=fprime_frames,
             force_movement=args.force_movement, tick_repeat=max(1, args.tick_repeat),
-            episode_tics=episode_tics, auto_restart=args.auto_restart
+            episode_tics=episode_tics, auto_restart=args.auto_restart, legacy_json=args.legacy_json,
+            t0_ring_size=args.t0_ring_size, t0_fsync_every=args.t0_fsync_every,
+            helper_window=not args.no_helper_window, t0_compress=args.t0_compress
         )
     else:
         run_episode(
@@ -427,7 +800,9 @@ def main():
             weapon=args.weapon, sweep_period=args.sweep_period, repeat=max(1, args.repeat),
             give_all=args.give_all, inf_ammo=args.inf_ammo, hp_floor=(args.hp_floor or None), turbo=args.turbo,
             t0_every=args.t0_every, t0_jsonl=t0_jsonl, fprime_frames=fprime_frames,
-            force_movement=args.force_movement, episode_tics=episode_tics
+            force_movement=args.force_movement, episode_tics=episode_tics, legacy_json=args.legacy_json,
+            t0_ring_size=args.t0_ring_size, t0_fsync_every=args.t0_fsync_every,
+            t0_compress=args.t0_compress
         )
 
 if __name__ == "__main__":